@@ -24,7 +24,7 @@ descriptor = encoder.image_descriptor(0, 0, width, height)
 
 # then the LZW compressed pixel data.
 # note the minimum code length is at least 2.
-data = encoder.Compression(2)([0] * width * height)
+data = encoder.Compression(2)(b'\x00' * (width * height))
 
 # the file ends with the trailor '0x3B'.
 trailor = bytearray([0x3B])
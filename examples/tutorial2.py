@@ -30,7 +30,7 @@ descriptor = encoder.image_descriptor(0, 0, width, height)
 compress = encoder.Compression(color_depth)
 data = bytearray()
 for i in range(3):
-    data += graphics_control + descriptor + compress([i] * width * height)
+    data += graphics_control + descriptor + compress(bytes([i]) * (width * height))
 
 trailor = bytearray([0x3B])
 
@@ -16,10 +16,12 @@ color_depth = 8
 # define a surface to draw on.
 surface = gm.GIFSurface(width, height, color_depth, bg_color=0)
 
-palette = [0, 0, 0, 200, 200, 200, 255, 0, 255]
-for i in range(256):
-    rgb = hls_to_rgb((i / 360.0) % 1, 0.5, 1.0)
-    palette += [int(round(255 * x)) for x in rgb]
+# the remaining 253 colors of the palette are taken from the hue circle,
+# the colors are written into a bytearray directly.
+palette = bytearray([0, 0, 0, 200, 200, 200, 255, 0, 255])
+palette.extend(int(round(255 * x))
+               for i in range(256 - 3)
+               for x in hls_to_rgb(i / 360.0, 0.5, 1.0))
 
 surface.set_palette(palette)
 
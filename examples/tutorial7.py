@@ -19,10 +19,12 @@ color_depth = 8
 surface = gm.GIFSurface.from_image('teacher.png', color_depth)
 
 # set the 0-th color to be the same with the blackboard's.
-palette = [52, 51, 50, 200, 200, 200, 255, 0, 255]
-for i in range(256):
-    rgb = hls_to_rgb((i / 360.0) % 1, 0.5, 1.0)
-    palette += [int(round(255 * x)) for x in rgb]
+# the remaining 253 colors of the palette are taken from the hue circle,
+# the colors are written into a bytearray directly.
+palette = bytearray([52, 51, 50, 200, 200, 200, 255, 0, 255])
+palette.extend(int(round(255 * x))
+               for i in range(256 - 3)
+               for x in hls_to_rgb(i / 360.0, 0.5, 1.0))
 
 surface.set_palette(palette)
 
@@ -3,64 +3,74 @@
 import heapq
 import random
 from collections import deque
+from itertools import count
 from operator import itemgetter
 from .maze import Maze
 
 
 def prim(maze, start):
     """Maze by Prim's algorithm."""
-    queue = [(0, start, v) for v in maze.get_neighbors(start)]
-    maze.mark_cell(start, Maze.TREE)
+    grid = maze.grid
+    start = maze.cell_id(start)
+    # a counter breaks ties between equal weights so the cells are never compared.
+    tiebreak = count()
+    queue = [(0, next(tiebreak), start, v) for v in maze.get_neighbor_ids(start)]
+    maze.mark_cell_id(start, Maze.TREE)
 
     while len(queue) > 0:
-        _, parent, child = heapq.heappop(queue)
-        if maze.in_tree(child):
+        _, _, parent, child = heapq.heappop(queue)
+        if grid[child] == Maze.TREE:
             continue
-        maze.mark_cell(child, Maze.TREE)
-        maze.mark_space(parent, child, Maze.TREE)
-        for v in maze.get_neighbors(child):
+        maze.mark_cell_id(child, Maze.TREE)
+        maze.mark_space_ids(parent, child, Maze.TREE)
+        for v in maze.get_neighbor_ids(child):
             # assign a weight to this edge only when it's needed.
             weight = random.random()
-            heapq.heappush(queue, (weight, child, v))
-
-        maze.anim.refresh_frame()
+            heapq.heappush(queue, (weight, next(tiebreak), child, v))
     maze.anim.clear_remaining_changes()
 
 
 
 def random_dfs(maze, start):
     """Maze by random depth-first search."""
-    stack = [(start, v) for v in maze.get_neighbors(start)]
-    maze.mark_cell(start, Maze.TREE)
+    grid = maze.grid
+    start = maze.cell_id(start)
+    stack = [(start, v) for v in maze.get_neighbor_ids(start)]
+    maze.mark_cell_id(start, Maze.TREE)
 
     while len(stack) > 0:
         parent, child = stack.pop()
-        if maze.in_tree(child):
+        if grid[child] == Maze.TREE:
             continue
-        maze.mark_cell(child, Maze.TREE)
-        maze.mark_space(parent, child, Maze.TREE)
-        neighbors = maze.get_neighbors(child)
+        maze.mark_cell_id(child, Maze.TREE)
+        maze.mark_space_ids(parent, child, Maze.TREE)
+        neighbors = list(maze.get_neighbor_ids(child))
         random.shuffle(neighbors)
         for v in neighbors:
             stack.append((child, v))
-
-        maze.anim.refresh_frame()
     maze.anim.clear_remaining_changes()
 
 
 def kruskal(maze):
     """Maze by Kruskal's algorithm."""
-    parent = {v: v for v in maze.cells}
-    rank = {v: 0 for v in maze.cells}
-    edges = [(random.random(), u, v) for u in maze.cells \
-             for v in maze.get_neighbors(u) if u < v]
+    # the disjoint-set forest, indexed by cell ids.
+    parent = list(range(maze.width * maze.height))
+    rank = [0] * (maze.width * maze.height)
+    edges = [(random.random(), u, v) for u in maze.cell_ids \
+             for v in maze.get_neighbor_ids(u) if u < v]
 
     #---
     def find(v):
-        """find the root of the subtree that v belongs to."""
-        while parent[v] != v:
-            v = parent[v]
-        return v
+        """
+        find the root of the subtree that v belongs to, and compress the path
+        by linking all the nodes along the way directly to the root.
+        """
+        root = v
+        while parent[root] != root:
+            root = parent[root]
+        while parent[v] != root:
+            parent[v], v = root, parent[v]
+        return root
 
     for _, u, v in sorted(edges, key=itemgetter(0)):
         root1 = find(u)
@@ -74,10 +84,9 @@ def kruskal(maze):
                 parent[root1] = root2
                 rank[root2] += 1
 
-            maze.mark_cell(u, Maze.TREE)
-            maze.mark_cell(v, Maze.TREE)
-            maze.mark_space(u, v, Maze.TREE)
-            maze.anim.refresh_frame()
+            maze.mark_cell_id(u, Maze.TREE)
+            maze.mark_cell_id(v, Maze.TREE)
+            maze.mark_space_ids(u, v, Maze.TREE)
 
     maze.anim.clear_remaining_changes()
 
@@ -99,52 +108,58 @@ def wilson(maze, root):
     Reference:
         "Probability on Trees and Networks", by Russell Lyons and Yuval Peres.
     """
-    maze.loop_erased_walk_path = []  # hold the path of the loop erased random walk.
+    grid = maze.grid
+    maze.loop_erased_walk_path = []  # hold the path (cell ids) of the loop erased random walk.
+    maze.loop_erased_walk_pos = {}   # map the cells in the path to their indices in it.
 
     def add_to_path(cell):
         """Add a cell to the path of current random walk."""
-        maze.mark_cell(cell, Maze.PATH)
-        maze.mark_space(maze.loop_erased_walk_path[-1], cell, Maze.PATH)
+        maze.mark_cell_id(cell, Maze.PATH)
+        maze.mark_space_ids(maze.loop_erased_walk_path[-1], cell, Maze.PATH, refresh=False)
+        maze.loop_erased_walk_pos[cell] = len(maze.loop_erased_walk_path)
         maze.loop_erased_walk_path.append(cell)
 
     def erase_loop(cell):
         """
         When a cell is visited twice then a loop is created, erase it.
         """
-        index = maze.loop_erased_walk_path.index(cell)
+        index = maze.loop_erased_walk_pos[cell]
         # erase the loop
-        maze.mark_path(maze.loop_erased_walk_path[index:], Maze.WALL)
-        maze.mark_cell(maze.loop_erased_walk_path[index], Maze.PATH)
-        maze.loop_erased_walk_path = maze.loop_erased_walk_path[:index+1]
+        maze.mark_path_ids(maze.loop_erased_walk_path[index:], Maze.WALL, refresh=False)
+        maze.mark_cell_id(maze.loop_erased_walk_path[index], Maze.PATH)
+        for c in maze.loop_erased_walk_path[index+1:]:
+            del maze.loop_erased_walk_pos[c]
+        del maze.loop_erased_walk_path[index+1:]
 
     # the algorithm begins here.
     # initially the tree contains only the root.
-    maze.mark_cell(root, Maze.TREE)
+    maze.mark_cell_id(maze.cell_id(root), Maze.TREE)
 
     # for each cell that is not in the tree,
     # start a loop erased random walk from this cell until the walk hits the tree.
-    for cell in maze.cells:
-        if not maze.in_tree(cell):
+    for cell in maze.cell_ids:
+        if grid[cell] != Maze.TREE:
             maze.loop_erased_walk_path = [cell]
-            maze.mark_cell(cell, Maze.PATH)
+            maze.loop_erased_walk_pos = {cell: 0}
+            maze.mark_cell_id(cell, Maze.PATH)
             current_cell = cell
 
-            while not maze.in_tree(current_cell):
-                next_cell = random.choice(maze.get_neighbors(current_cell))
-                if maze.in_path(next_cell):  # if it's already in the path then a loop is found.
+            while grid[current_cell] != Maze.TREE:
+                next_cell = random.choice(maze.get_neighbor_ids(current_cell))
+                if grid[next_cell] == Maze.PATH:  # if it's already in the path then a loop is found.
                     erase_loop(next_cell)
-                elif maze.in_tree(next_cell):  # if the walk hits the tree then finish the walk.
+                elif grid[next_cell] == Maze.TREE:  # if the walk hits the tree then finish the walk.
                     add_to_path(next_cell)
                     # `add_to_path` will change the cell to `PATH` so we need to reset it.
-                    maze.mark_cell(next_cell, Maze.TREE)
+                    maze.mark_cell_id(next_cell, Maze.TREE)
                 else:  # continue the walk from this new cell.
                     add_to_path(next_cell)
                 current_cell = next_cell
-
+                # the step is done only here, so the frame is not written halfway.
                 maze.anim.refresh_frame()
 
             # once the walk hits the tree then add its path to the tree.
-            maze.mark_path(maze.loop_erased_walk_path, Maze.TREE)
+            maze.mark_path_ids(maze.loop_erased_walk_path, Maze.TREE)
 
     maze.anim.clear_remaining_changes()
 
@@ -167,107 +182,114 @@ def retrieve_path(came_from, start, end):
 
 def bfs(maze, start, end):
     """Solve the maze by breadth-first search."""
-
-    # a helper function
-    def dist_to_color(distance):
-        """
-        Map the distance of a cell to the start to a color index.
-        This is because we must make sure that the assigned number of each cell
-        lies between 0 and the total number of colors in the image,
-        otherwise the initial dict of the encoder cannot recognize it.
-        """
-        return max(distance % maze.anim.num_colors, 3)
-
+    # The loop below runs once for each cell, so the methods and
+    # attributes it uses are looked up only once here.
+    grid = maze.grid
+    mark_cell = maze.mark_cell_id
+    mark_space = maze.mark_space_ids
+    get_neighbors = maze.get_neighbor_ids
+    # The distance of a cell to the start is mapped to the color index
+    # `max(dist % num_colors, 3)`. This is because we must make sure that the
+    # assigned number of each cell lies between 0 and the total number of colors
+    # in the image, otherwise the encoder cannot recognize it.
+    # `num_colors` is a power of 2 so the modulo is computed by a bitmask.
+    color_mask = maze.anim.num_colors - 1
+
+    start, end = maze.cell_id(start), maze.cell_id(end)
     dist = 0
     came_from = {start: start}
     queue = deque([(start, dist)])
-    maze.mark_cell(start, dist_to_color(dist))
+    mark_cell(start, max(dist & color_mask, 3))
     visited = set([start])
 
     while len(queue) > 0:
         child, dist = queue.popleft()
         parent = came_from[child]
-        maze.mark_cell(child, dist_to_color(dist))
-        maze.mark_space(parent, child, dist_to_color(dist))
+        color = max(dist & color_mask, 3)
+        mark_cell(child, color)
+        mark_space(parent, child, color)
 
-        for next_cell in maze.get_neighbors(child):
-            if (next_cell not in visited) and (not maze.barrier(child, next_cell)):
+        for next_cell in get_neighbors(child):
+            if (next_cell not in visited) and (grid[(child + next_cell) // 2] != Maze.WALL):
                 came_from[next_cell] = child
                 queue.append((next_cell, dist + 1))
                 visited.add(next_cell)
-
-        maze.anim.refresh_frame()
     maze.anim.clear_remaining_changes()
 
     # retrieve the path
     path = retrieve_path(came_from, start, end)
-    maze.mark_path(path, Maze.PATH)
+    maze.mark_path_ids(path, Maze.PATH)
     # show the path
     maze.anim.clear_remaining_changes()
 
 
 def dfs(maze, start, end):
     """Solve the maze by depth-first search."""
-
-    def dist_to_color(distance):
-        return max(distance % maze.anim.num_colors, 3)
-
+    # see `bfs` for the local variables and the color of a cell.
+    grid = maze.grid
+    mark_cell = maze.mark_cell_id
+    mark_space = maze.mark_space_ids
+    get_neighbors = maze.get_neighbor_ids
+    color_mask = maze.anim.num_colors - 1
+
+    start, end = maze.cell_id(start), maze.cell_id(end)
     dist = 0
     came_from = {start: start}  # a dict to remember each step.
     stack = [(start, dist)]
-    maze.mark_cell(start, dist_to_color(dist))
+    mark_cell(start, max(dist & color_mask, 3))
     visited = set([start])
 
     while len(stack) > 0:
         child, dist = stack.pop()
         parent = came_from[child]
-        maze.mark_cell(child, dist_to_color(dist))
-        maze.mark_space(parent, child, dist_to_color(dist))
-        for next_cell in maze.get_neighbors(child):
-            if (next_cell not in visited) and (not maze.barrier(child, next_cell)):
+        color = max(dist & color_mask, 3)
+        mark_cell(child, color)
+        mark_space(parent, child, color)
+        for next_cell in get_neighbors(child):
+            if (next_cell not in visited) and (grid[(child + next_cell) // 2] != Maze.WALL):
                 came_from[next_cell] = child
                 stack.append((next_cell, dist + 1))
                 visited.add(next_cell)
-
-        maze.anim.refresh_frame()
     maze.anim.clear_remaining_changes()
 
     path = retrieve_path(came_from, start, end)
-    maze.mark_path(path, Maze.PATH)
+    maze.mark_path_ids(path, Maze.PATH)
     maze.anim.clear_remaining_changes()
 
 
 def astar(maze, start, end):
     """Solve the maze by A* search."""
-    weighted_edges = {(u, v): 1.0 for u in maze.cells for v in maze.get_neighbors(u)}
-    queue = [(0, start)]
+    grid = maze.grid
+    start, end = maze.cell_id(start), maze.cell_id(end)
+    tiebreak = count()
+    queue = [(0, next(tiebreak), start)]
     came_from = {start: start}
     cost_so_far = {start: 0}
 
     def manhattan(u, v):
         """The heuristic distance between two cells."""
-        return abs(u[0] - v[0]) + abs(u[1] - v[1])
+        uy, ux = divmod(u, maze.width)
+        vy, vx = divmod(v, maze.width)
+        return abs(ux - vx) + abs(uy - vy)
 
     while len(queue) > 0:
-        _, child = heapq.heappop(queue)
+        _, _, child = heapq.heappop(queue)
         parent = came_from[child]
-        maze.mark_cell(child, Maze.FILL)
-        maze.mark_space(parent, child, Maze.FILL)
+        maze.mark_cell_id(child, Maze.FILL)
+        maze.mark_space_ids(parent, child, Maze.FILL)
         if child == end:
             break
 
-        for next_cell in maze.get_neighbors(child):
-            new_cost = cost_so_far[parent] + weighted_edges[(child, next_cell)]
+        for next_cell in maze.get_neighbor_ids(child):
+            new_cost = cost_so_far[parent] + 1  # all the edges have unit weight.
             if (next_cell not in cost_so_far or new_cost < cost_so_far[next_cell]) \
-               and (not maze.barrier(next_cell, child)):
+               and (grid[(next_cell + child) // 2] != Maze.WALL):
                 cost_so_far[next_cell] = new_cost
                 came_from[next_cell] = child
                 priority = new_cost + manhattan(next_cell, end)
-                heapq.heappush(queue, (priority, next_cell))
-
-        maze.anim.refresh_frame()
+                heapq.heappush(queue, (priority, next(tiebreak), next_cell))
     maze.anim.clear_remaining_changes()
 
     path = retrieve_path(came_from, start, end)
-    maze.mark_path(path, Maze.PATH)
+    maze.mark_path_ids(path, Maze.PATH)
     maze.anim.clear_remaining_changes()
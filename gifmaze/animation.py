@@ -22,6 +22,8 @@ class Animation(object):
         self.num_colors = 1 << surface.color_depth
         self.colormap = {i: i for i in range(self.num_colors)}
                                  # a dict that maps the value of a cell to its color index.
+        self._colormap_lut = bytearray(range(256))
+                                 # the same map as a translation table for `bytes.translate`.
         self.speed = 10          # output the frame once this number of cells are changed.
         self.trans_index = None  # the index of the transparent color in the global color table.
         self.delay = 5           # delay between successive frames.
@@ -44,6 +46,8 @@ class Animation(object):
         """
         if isinstance(cmap, dict):
             self.colormap.update(cmap)
+            for val, color in cmap.items():
+                self._colormap_lut[val] = color
 
     def set_control(self, **kwargs):
         """
@@ -60,27 +64,30 @@ class Animation(object):
         """
         control = graphics_control_block(delay, self.trans_index)
         descriptor = image_descriptor(0, 0, 1, 1)
-        self._surface.write(control + descriptor + self._surface.compress([self.trans_index]))
+        data = self._surface.compress(bytes([self.trans_index]))
+        self._surface.write(control, descriptor, data)
 
     def refresh_frame(self):
         """Update a frame in the animation and write it into the file."""
-        if self.maze.num_changes >= self.speed:
-            self._surface.write(self._encode_frame())
+        if self.maze.num_changes >= max(self.speed, 1):
+            self._surface.write(*self._encode_frame())
 
     def clear_remaining_changes(self):
         """Clear possibly remaining changes when the animation is finished."""
         if self.maze.num_changes > 0:
-            self._surface.write(self._encode_frame())
+            self._surface.write(*self._encode_frame())
 
     def _encode_frame(self):
-        """Encode current maze into one frame and return the encoded data."""
+        """
+        Encode current maze into one frame and return the encoded blocks
+        (graphics control block, image descriptor and image data).
+        It's called only when there are changes in the maze.
+        """
         # 1. the graphics control block
         control = graphics_control_block(self.delay, self.trans_index)
-        # 2. the image descriptor of this frame
-        if self.maze.frame_box is not None:
-            left, top, right, bottom = self.maze.frame_box
-        else:
-            left, top, right, bottom = 0, 0, self.maze.size[0] - 1, self.maze.size[1] - 1
+        # 2. the image descriptor of this frame, only the region that has
+        # changed since the last frame is encoded.
+        left, top, right, bottom = self.maze.frame_box
 
         width = right - left + 1
         height = bottom - top + 1
@@ -89,23 +96,28 @@ class Animation(object):
                                       self.cell_size * width,
                                       self.cell_size * height)
 
-        # A generator that yields the pixels of this frame. This may look a bit unintuitive
-        # because encoding frames will be called thousands of times in an animation and
-        # we should avoid creating and destroying a new list each time it's called.
-        def get_frame_pixels():
-            for i in range(width * height * self.cell_size * self.cell_size):
-                y = i // (width * self.cell_size * self.cell_size)
-                x = (i % (width * self.cell_size)) // self.cell_size
-                val = self.maze.get_cell((x + left, y + top))
-                yield self.colormap[val]
+        # Build the pixels row by row with C-level bytes operations: each row of cells
+        # is colored by a translation table, stretched horizontally by extended slice
+        # assignments and then repeated vertically `cell_size` times.
+        cell_size = self.cell_size
+        grid = self.maze.grid
+        stride = self.maze.width
+        lut = self._colormap_lut
+        scanline = bytearray(width * cell_size)
+        pixels = bytearray()
+        for y in range(top, bottom + 1):
+            row = grid[y * stride + left: y * stride + right + 1].translate(lut)
+            for k in range(cell_size):
+                scanline[k::cell_size] = row
+            pixels += scanline * cell_size
 
         # 3. the compressed image data of this frame
-        data = self._surface.compress(get_frame_pixels())
+        data = self._surface.compress(pixels)
 
         # clear `num_changes` and `frame_box`
         self.maze.reset()
 
-        return control + descriptor + data
+        return control, descriptor, data
 
     def add_maze(self, maze, cell_size, translation):
         self.maze = maze
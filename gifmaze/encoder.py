@@ -20,19 +20,57 @@ Reference for the GIF89a specification:
 
     http://giflib.sourceforge.net/whatsinagif/index.html
 """
-from struct import pack
+from functools import lru_cache
+from struct import Struct
+
+
+# the layouts of the blocks below, the format strings are parsed only once here.
+_screen_descriptor = Struct('<6s2H3B')
+_loop_control_block = Struct('<3B8s3s2BHB')
+_graphics_control_block = Struct('<4BH2B')
+_image_descriptor = Struct('<B4HB')
+
+
+def _pack_sub_blocks(bitstream, out, offset):
+    """
+    Copy `bitstream` into `out` starting at `offset` as data sub-blocks,
+    `out` must be large enough to hold them. Each block is of length <= 255
+    and is preceded by a byte in 0-255 that indicates the length of this block.
+    """
+    n = len(bitstream)
+    view = memoryview(bitstream)
+    for i in range(0, n, 255):
+        size = min(255, n - i)
+        out[offset] = size
+        out[offset + 1: offset + 1 + size] = view[i: i + size]
+        offset += size + 1
+
+
+def image_data(min_code_length, bitstream):
+    """
+    Return the complete image data of a frame: the minimum code length,
+    then the data sub-blocks of `bitstream` and finally the block terminator 0.
+    The output is allocated once with its final length and the sub-blocks are
+    copied into it by index, `bitstream` itself is never sliced.
+    """
+    n = len(bitstream)
+    out = bytearray(n + (n + 254) // 255 + 2)  # the last byte is already 0
+    out[0] = min_code_length
+    _pack_sub_blocks(bitstream, out, 1)
+    return out
 
 
 class DataBlock(object):
     """
     Write bits into a bytearray and then pack this bytearray into data blocks.
-    This class is used in the Lempel-Ziv-Welch compression algorithm when
-    encoding maze into frames.
+    The Lempel-Ziv-Welch compression algorithm below packs its codes in the
+    same way, but it keeps the accumulator in local variables for speed.
     """
 
     def __init__(self):
-        self._bitstream = bytearray()  # write bits into this array
-        self._nbits = 0  # a counter holds how many bits have been written
+        self._bitstream = bytearray()  # the completed bytes are written into this array
+        self._acc = 0    # an accumulator holds the bits that do not fill a byte yet
+        self._nbits = 0  # a counter holds how many bits are in the accumulator
 
     def encode_bits(self, num, size):
         """
@@ -44,35 +82,53 @@ class DataBlock(object):
         binary data stream increases from lower (least significant) bits to higher
         (most significant) bits, so we have to reverse it as '11000' and pack
         this string at the end of bitstream!
+
+        Instead of handling the bits one by one, the whole number is shifted into
+        an integer accumulator above the pending bits (this is exactly the
+        reversed order above), and the completed low bytes are moved out to the
+        bitstream.
         """
-        string = bin(num)[2:].zfill(size)
-        for digit in reversed(string):
-            if len(self._bitstream) * 8 == self._nbits:
-                self._bitstream.append(0)
-            if digit == '1':
-                self._bitstream[-1] |= 1 << self._nbits % 8
-            self._nbits += 1
+        self._acc |= num << self._nbits
+        self._nbits += size
+        while self._nbits >= 8:
+            self._bitstream.append(self._acc & 0xFF)
+            self._acc >>= 8
+            self._nbits -= 8
 
     def dump_bytes(self):
         """
         Pack the LZW encoded image data into blocks.
         Each block is of length <= 255 and is preceded by a byte
         in 0-255 that indicates the length of this block.
-        Each time after this function is called `_nbits` and
+        Each time after this function is called `_acc`, `_nbits` and
         `_bitstream` are reset to 0 and empty.
+        The encoders in this module use `dump_image_data`, this method is
+        kept as part of the public API of this class.
+        """
+        bitstream = self._flush()
+        n = len(bitstream)
+        bytestream = bytearray(n + (n + 254) // 255)
+        _pack_sub_blocks(bitstream, bytestream, 0)
+        return bytestream
+
+    def dump_image_data(self, min_code_length):
+        """
+        The same with `dump_bytes` but the blocks are preceded by the minimum
+        code length and followed by the block terminator, see `image_data`.
         """
-        bytestream = bytearray()
-        while len(self._bitstream) > 255:
-            bytestream.append(255)
-            bytestream.extend(self._bitstream[:255])
-            self._bitstream = self._bitstream[255:]
-        if len(self._bitstream) > 0:
-            bytestream.append(len(self._bitstream))
-            bytestream.extend(self._bitstream)
+        return image_data(min_code_length, self._flush())
 
+    def _flush(self):
+        """Return the bitstream with the pending bits and reset this block."""
+        # the pending bits are padded with zeros to a whole byte.
+        if self._nbits > 0:
+            self._bitstream.append(self._acc)
+
+        bitstream = self._bitstream
+        self._acc = 0
         self._nbits = 0
         self._bitstream = bytearray()
-        return bytestream
+        return bitstream
 
 
 class Compression(object):
@@ -98,7 +154,6 @@ class Compression(object):
         and not 2 <= min_code_length <= 12:
             raise ValueError('Invalid minimum code length.')
 
-        self._stream = DataBlock()
         self._min_code_length = min_code_length
         self._clear_code = 1 << min_code_length
         self._end_code = self._clear_code + 1
@@ -106,42 +161,136 @@ class Compression(object):
 
     def __call__(self, input_data):
         """
-        input_data: a 1-d list consists of integers in range [0, 255],
-            these integers are the indices of the colors of the pixels
-            in the global color table.
+        input_data: a bytes-like object (bytes, bytearray or memoryview) consists
+            of integers in range [0, 255], these integers are the indices of the
+            colors of the pixels in the global color table. A list of such
+            integers is also accepted, it will be converted to bytes first.
 
         We do not check the validity of the input data here for efficiency.
         """
+        if not isinstance(input_data, (bytes, bytearray, memoryview)):
+            input_data = bytes(input_data)
+
+        # the loop below runs once for each pixel, so look up the
+        # attributes only once and keep them in local variables.
+        min_code_length = self._min_code_length
+        clear_code = self._clear_code
+        end_code = self._end_code
+        max_codes = self._max_codes
+
+        # The codes are packed into the bitstream as in `DataBlock.encode_bits`:
+        # `acc` holds the pending bits and `nbits` counts them, the completed
+        # low bytes are moved to the bitstream. It's written out inline since
+        # a code is emitted for almost every pixel of a noisy image.
+        bitstream = bytearray()
+        append = bitstream.append
+
         # this is actually the minimum code length used
-        code_length = self._min_code_length + 1
-        next_code = self._end_code + 1
-        # the default initial dict
-        code_table = {(i,): i for i in range(1 << self._min_code_length)}
+        code_length = min_code_length + 1
+        # the code length grows by one once `next_code` reaches this value
+        grow_code = (1 << code_length) + 1
+        next_code = end_code + 1
+        # The code table is a trie: each entry extends the string of an existing
+        # code `prefix` by one pixel `c`, so it's keyed by the integer
+        # `(prefix << 8) | c`. The single-pixel strings are never stored since
+        # the code of a color index is the index itself.
+        code_table = {}
+        get_code = code_table.get  # a single lookup serves both the hit and the miss
         # output the clear code
-        self._stream.encode_bits(self._clear_code, code_length)
-
-        pattern = tuple()
-        for c in input_data:
-            pattern += (c,)
-            if pattern not in code_table:
-                # add new code to the table
-                code_table[pattern] = next_code
-                # output the prefix
-                self._stream.encode_bits(code_table[pattern[:-1]], code_length)
-                pattern = (c,)  # suffix becomes the current pattern
+        acc = clear_code
+        nbits = code_length
+
+        pixels = iter(input_data)
+        prefix = next(pixels, None)  # `None` only if there are no pixels at all
+        for c in pixels:
+            code = get_code((prefix << 8) | c)
+            if code is not None:
+                prefix = code
+            else:
+                # add new code to the table and output the prefix
+                code_table[(prefix << 8) | c] = next_code
+                acc |= prefix << nbits
+                nbits += code_length
+                while nbits >= 8:
+                    append(acc & 0xFF)
+                    acc >>= 8
+                    nbits -= 8
+                prefix = c  # suffix becomes the current pattern
 
                 next_code += 1
-                if next_code == 2**code_length + 1:
+                if next_code == grow_code:
                     code_length += 1
+                    grow_code = (1 << code_length) + 1
+                if next_code == max_codes:
+                    next_code = end_code + 1
+                    acc |= clear_code << nbits
+                    nbits += code_length
+                    code_length = min_code_length + 1
+                    grow_code = (1 << code_length) + 1
+                    # the table holds no initial entries, so a reset is just
+                    # emptying it in place and `get_code` stays bound to it.
+                    code_table.clear()
+
+        # output the last pattern and the end code, then pad the pending bits
+        # with zeros to whole bytes.
+        if prefix is not None:
+            acc |= prefix << nbits
+            nbits += code_length
+        acc |= end_code << nbits
+        nbits += code_length
+        while nbits > 0:
+            append(acc & 0xFF)
+            acc >>= 8
+            nbits -= 8
+
+        return image_data(min_code_length, bitstream)
+
+    def encode_constant(self, color, length):
+        """
+        Encode `length` pixels of the same color index `color`, the result is
+        the same with `self(bytes([color]) * length)`.
+
+        For such an input the encoder matches the strings c, cc, ccc, ... in turn,
+        the k-th code emitted after a clear code always stands for a run of k
+        pixels. So the codes can be computed directly, one for each run, and
+        the number of steps is only about the square root of `length`.
+        """
+        stream = DataBlock()
+        min_code_length = self._min_code_length
+        end_code = self._end_code
+
+        code_length = min_code_length + 1
+        grow_code = (1 << code_length) + 1
+        next_code = end_code + 1
+        stream.encode_bits(self._clear_code, code_length)
+
+        if length > 0:
+            # the string of `run` pixels has code `end_code + run - 1` in the table,
+            # except the single pixel whose code is the color itself.
+            run = 1
+            remaining = length - 1  # the pixels after the first one
+            while remaining >= run:
+                stream.encode_bits(color if run == 1 else end_code + run - 1, code_length)
+                remaining -= run
+                run += 1
+
+                next_code += 1
+                if next_code == grow_code:
+                    code_length += 1
+                    grow_code = (1 << code_length) + 1
                 if next_code == self._max_codes:
-                    next_code = self._end_code + 1
-                    self._stream.encode_bits(self._clear_code, code_length)
-                    code_length = self._min_code_length + 1
-                    code_table = {(i,): i for i in range(1 << self._min_code_length)}
+                    next_code = end_code + 1
+                    stream.encode_bits(self._clear_code, code_length)
+                    code_length = min_code_length + 1
+                    grow_code = (1 << code_length) + 1
+                    run = 1
+
+            # the last run is shorter than the next one in the table.
+            run = remaining + 1
+            stream.encode_bits(color if run == 1 else end_code + run - 1, code_length)
 
-        self._stream.encode_bits(code_table[pattern], code_length)
-        self._stream.encode_bits(self._end_code, code_length)
-        return bytearray([self._min_code_length]) + self._stream.dump_bytes() + bytearray([0])
+        stream.encode_bits(end_code, code_length)
+        return stream.dump_image_data(min_code_length)
 
 
 def screen_descriptor(width, height, color_depth):
@@ -149,16 +298,18 @@ def screen_descriptor(width, height, color_depth):
     This block specifies both the size of the image and its global color table.
     """
     byte = 0b10000000 | (color_depth - 1) | (color_depth - 1) << 4
-    return pack('<6s2H3B', b'GIF89a', width, height, byte, 0, 0)
+    return _screen_descriptor.pack(b'GIF89a', width, height, byte, 0, 0)
 
 
 def loop_control_block(loop):
     """
     This block specifies the number of loops (0 means loop infinitely).
     """
-    return pack('<3B8s3s2BHB', 0x21, 0xFF, 11, b'NETSCAPE', b'2.0', 3, 1, loop, 0)
+    return _loop_control_block.pack(0x21, 0xFF, 11, b'NETSCAPE', b'2.0', 3, 1, loop, 0)
 
 
+# this block is written before every frame with the same few arguments.
+@lru_cache(maxsize=32)
 def graphics_control_block(delay, trans_index=None):
     """
     This block specifies the delay and transparent color of the coming frame.
@@ -166,9 +317,9 @@ def graphics_control_block(delay, trans_index=None):
     For static frames this block is not added.
     """
     if trans_index is None:
-        return pack("<4BH2B", 0x21, 0xF9, 4, 0b00000100, delay, 0, 0)
+        return _graphics_control_block.pack(0x21, 0xF9, 4, 0b00000100, delay, 0, 0)
     else:
-        return pack("<4BH2B", 0x21, 0xF9, 4, 0b00000101, delay, trans_index, 0)
+        return _graphics_control_block.pack(0x21, 0xF9, 4, 0b00000101, delay, trans_index, 0)
 
 
 def image_descriptor(left, top, width, height, byte=0):
@@ -176,12 +327,13 @@ def image_descriptor(left, top, width, height, byte=0):
     This block specifies the position of the coming frame (relative to the window)
     and whether it has a local color table or not.
     """
-    return pack('<B4HB', 0x2C, left, top, width, height, byte)
+    return _image_descriptor.pack(0x2C, left, top, width, height, byte)
+
 
 def global_color_table(color_depth, palette):
     """
     Return a valid global color table.
-    The global color table of a GIF image is a 1-d bytearray of the form
+    The global color table of a GIF image is a 1-d bytes object of the form
     [r1, g1, b1, r2, g2, b2, ...] with length equals to 2**n where n is
     the color depth of the image.
 
@@ -190,14 +342,17 @@ def global_color_table(color_depth, palette):
 
     color_depth: color depth of the GIF.
 
-    palette: a list of rgb colors of the format [r1, g1, b1, r2, g2, b2, ...].
-        The number of colors must be greater than or equal to 2**n where n is
-        the color depth. Redundant colors will be discarded.
+    palette: a list of rgb colors of the format [r1, g1, b1, r2, g2, b2, ...],
+        or a bytes-like object (bytes, bytearray, array.array('B'), ...) of
+        the same format. The number of colors must be greater than or equal
+        to 2**n where n is the color depth. Redundant colors will be discarded.
+        A `bytes` palette is used as it is without being copied.
     """
-    try:
-        palette = bytearray(palette)
-    except:
-        raise ValueError('Cannot convert palette to bytearray.')
+    if not isinstance(palette, bytes):
+        try:
+            palette = bytes(palette)
+        except:
+            raise ValueError('Cannot convert palette to bytes.')
 
     valid_length = 3 * (1 << color_depth)
     if len(palette) < valid_length:
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from itertools import compress
 from PIL import Image
 
 
@@ -14,6 +15,10 @@ class Maze(object):
     3: it's filled (this will not be used until the maze-searching animation)
     Initially all cells are walls.
     Adjacent cells in the maze are spaced out by one cell.
+
+    The grid is stored densely as one flat bytearray with a byte per cell
+    (see `grid`), so a maze takes only `width * height` bytes and a row of
+    cells is a contiguous slice when the frames are encoded.
     """
 
     WALL = 0
@@ -38,102 +43,234 @@ class Maze(object):
             raise ValueError('The width and height must both be odd integers.')
 
         self.size = (width, height)
-        self._grid = [[0] * height for _ in range(width)]
+        self.width, self.height = width, height
+        # the cells are stored row by row in a flat bytearray, one byte per cell,
+        # i.e. the value of cell (x, y) is `self._grid[y * width + x]`.
+        self._grid = bytearray(width * height)
         self._num_changes = 0   # a counter holds how many cells are changed.
-        self._frame_box = None  # a 4-tuple maintains the region that to be updated.
+        # the region that to be updated, kept as four integers so that marking a cell
+        # does not build a new tuple. `_fb_l < 0` means the region is empty.
+        self._fb_l = self._fb_t = self._fb_r = self._fb_b = -1
+        self.anim = None        # the animation this maze is bound to.
 
         if mask is not None:
-            if isinstance(mask, Image.Image):
-                mask = mask.convert('L').resize(self.size)
-            else:
-                mask = Image.open(mask).convert('L').resize(self.size)
-
-        def get_mask_pixel(cell):
-            return mask is None or mask.getpixel(cell) == 255
-
-        self.cells = []
-        for y in range(0, height, 2):
-            for x in range(0, width, 2):
-                if get_mask_pixel((x, y)):
-                    self.cells.append((x, y))
-
-        def neighborhood(cell):
-            x, y = cell
-            neighbors = []
-            if x >= 2 and get_mask_pixel((x - 2, y)):
-                neighbors.append((x - 2, y))
-            if y >= 2 and get_mask_pixel((x, y - 2)):
-                neighbors.append((x, y - 2))
-            if x <= width - 3 and get_mask_pixel((x + 2, y)):
-                neighbors.append((x + 2, y))
-            if y <= height - 3 and get_mask_pixel((x, y + 2)):
-                neighbors.append((x, y + 2))
-            return neighbors
-
-        self._graph = {v: neighborhood(v) for v in self.cells}
+            if not isinstance(mask, Image.Image):
+                mask = Image.open(mask)
+            # the mask is binary, a nearest resampling keeps it binary while
+            # the default filter would blur the edges into grey pixels.
+            mask = mask.convert('L').resize(self.size, Image.NEAREST)
+            # read all the pixels at once, they are ordered row by row like `_grid`.
+            mask = mask.tobytes()
+
+        # The cells are at the even positions of the grid. Each row of cells is
+        # read as a bytes object whose j-th byte tells if (2j, y) is a cell, it's
+        # taken from the mask with an extended slice and a translation table that
+        # maps white to 1 and the other pixels to 0. The rows are padded with zeros
+        # at both ends and there are two zero rows above and below them, so the
+        # neighbors of a cell are looked up without checking the borders.
+        cols = (width + 1) // 2
+        if mask is None:
+            rows = [b'\x01' * cols] * ((height + 1) // 2)
+        else:
+            white = bytes(255) + b'\x01'
+            rows = [mask[y * width: (y + 1) * width: 2].translate(white)
+                    for y in range(0, height, 2)]
+        rows = [bytes(cols + 2)] + [b'\x00' + row + b'\x00' for row in rows] + [bytes(cols + 2)]
+
+        # Each cell is also identified by an integer id: its index in `_grid`.
+        # The algorithms work with ids so they do not hash (x, y) tuples in
+        # their loops, and the space between two adjacent cells `i` and `j` is
+        # simply `(i + j) // 2`. Only the ids are stored, the tuples are built by
+        # `cells` on demand.
+        self.cell_ids = []
+
+        # a table indexed by cell ids that holds the ids of the neighbors of each cell,
+        # it's built once here so that looking up the neighbors allocates nothing.
+        # The entries are tuples: they are smaller than lists and cannot be
+        # changed by accident, the positions that are not cells share the empty tuple.
+        self._neighbors = [()] * (width * height)
+        for k in range(1, len(rows) - 1):
+            above, row, below = rows[k - 1], rows[k], rows[k + 1]
+            y = 2 * (k - 1)
+            for j in compress(range(cols + 2), row):
+                x = 2 * (j - 1)
+                i = y * width + x
+                neighbors = []
+                if row[j - 1]:
+                    neighbors.append(i - 2)
+                if above[j]:
+                    neighbors.append(i - 2 * width)
+                if row[j + 1]:
+                    neighbors.append(i + 2)
+                if below[j]:
+                    neighbors.append(i + 2 * width)
+                self.cell_ids.append(i)
+                self._neighbors[i] = tuple(neighbors)
 
     def __str__(self):
         return '{0}({1}x{2})'.format(self.__class__.__name__, self.width, self.height)
 
     __repr__ = __str__
 
+    def cell_id(self, cell):
+        """Return the id of a cell given as a tuple (x, y)."""
+        x, y = cell
+        return y * self.width + x
+
+    def cell_xy(self, i):
+        """Return the cell (x, y) of a given id."""
+        y, x = divmod(i, self.width)
+        return (x, y)
+
     def get_neighbors(self, cell):
-        return self._graph[cell]
+        return [self.cell_xy(i) for i in self._neighbors[self.cell_id(cell)]]
+
+    def get_neighbor_ids(self, i):
+        """
+        Return the ids of the neighbors of the cell with id `i` as a tuple.
+        Note the returned tuple is the table entry itself.
+        """
+        return self._neighbors[i]
 
     def mark_cell(self, cell, value):
         """Mark a cell and update `frame_box` and `num_changes`."""
         x, y = cell
-        self._grid[x][y] = value
+        self.mark_cell_id(y * self.width + x, value)
+
+    def mark_cell_id(self, i, value):
+        """
+        Mark the cell with id `i` and update `frame_box` and `num_changes`.
+        Marking a cell with the value it already has is not a change,
+        it neither counts nor extends the region to be updated.
+        """
+        if self._grid[i] == value:
+            return
+        self._grid[i] = value
         self._num_changes += 1
 
-        if self._frame_box is not None:
-            left, top, right, bottom = self._frame_box
-            self._frame_box = (min(x, left),  min(y, top),
-                               max(x, right), max(y, bottom))
+        y, x = divmod(i, self.width)
+        if self._fb_l < 0:
+            self._fb_l = self._fb_r = x
+            self._fb_t = self._fb_b = y
         else:
-            self._frame_box = (x, y, x, y)
+            if x < self._fb_l:
+                self._fb_l = x
+            elif x > self._fb_r:
+                self._fb_r = x
+            if y < self._fb_t:
+                self._fb_t = y
+            elif y > self._fb_b:
+                self._fb_b = y
 
-    def mark_space(self, c1, c2, value):
+    def mark_space(self, c1, c2, value, refresh=True):
         """Mark the space between two adjacent cells."""
-        c = ((c1[0] + c2[0]) // 2, (c1[1] + c2[1]) // 2)
-        self.mark_cell(c, value)
+        self.mark_space_ids(self.cell_id(c1), self.cell_id(c2), value, refresh)
+
+    def mark_space_ids(self, i, j, value, refresh=True):
+        """
+        Mark the space between two adjacent cells given by their ids.
+
+        A step of an algorithm usually ends with connecting two cells, so this is
+        where a new frame is written once the number of changes reaches the speed
+        of the bound animation, the algorithms need not check it themselves.
+        If the step goes on after this call, pass `refresh=False` and call
+        `refresh_frame` of the animation at the end of the step instead,
+        otherwise a frame may show a half-done step.
+        """
+        self.mark_cell_id((i + j) // 2, value)
+        if refresh and self.anim is not None and self._num_changes >= self.anim.speed:
+            self.anim.refresh_frame()
 
-    def mark_path(self, path, value):
+    def mark_path(self, path, value, refresh=True):
         """Mark the cells in a path and the spaces between them."""
-        for cell in path:
-            self.mark_cell(cell, value)
-        for c1, c2 in zip(path[1:], path[:-1]):
-            self.mark_space(c1, c2, value)
+        self.mark_path_ids([self.cell_id(cell) for cell in path], value, refresh)
+
+    def mark_path_ids(self, path, value, refresh=True):
+        """
+        The same with `mark_path` but the path is a list of cell ids.
+        The cells are written in bulk and `frame_box` is extended only once.
+        Like `mark_space_ids` a new frame is written if needed after
+        the whole path is marked, unless `refresh` is `False`.
+        """
+        grid = self._grid
+        width = self.width
+        spaces = [(i + j) // 2 for i, j in zip(path[1:], path[:-1])]
+        changed = [i for i in path + spaces if grid[i] != value]
+
+        if len(changed) > 0:
+            for i in changed:
+                grid[i] = value
+            self._num_changes += len(changed)
+
+            # the cells are stored row by row so the ids are ordered by `y` first,
+            # and only the columns need a pass of their own.
+            top = min(changed) // width
+            bottom = max(changed) // width
+            columns = [i % width for i in changed]
+            left, right = min(columns), max(columns)
+            if self._fb_l < 0:
+                self._fb_l, self._fb_t, self._fb_r, self._fb_b = left, top, right, bottom
+            else:
+                self._fb_l = min(left, self._fb_l)
+                self._fb_t = min(top, self._fb_t)
+                self._fb_r = max(right, self._fb_r)
+                self._fb_b = max(bottom, self._fb_b)
+
+        if refresh and self.anim is not None and self._num_changes >= self.anim.speed:
+            self.anim.refresh_frame()
 
     def get_cell(self, cell):
         x, y = cell
-        return self._grid[x][y]
+        return self._grid[y * self.width + x]
 
     def barrier(self, c1, c2):
         """Check if two adjacent cells are connected."""
         x = (c1[0] + c2[0]) // 2
         y = (c1[1] + c2[1]) // 2
-        return self._grid[x][y] == Maze.WALL
+        return self._grid[y * self.width + x] == Maze.WALL
 
     def is_wall(self, cell):
         x, y = cell
-        return self._grid[x][y] == Maze.WALL
+        return self._grid[y * self.width + x] == Maze.WALL
 
     def in_tree(self, cell):
         x, y = cell
-        return self._grid[x][y] == Maze.TREE
+        return self._grid[y * self.width + x] == Maze.TREE
 
     def in_path(self, cell):
         x, y = cell
-        return self._grid[x][y] == Maze.PATH
+        return self._grid[y * self.width + x] == Maze.PATH
 
     def reset(self):
         self._num_changes = 0
-        self._frame_box = None
+        self._fb_l = self._fb_t = self._fb_r = self._fb_b = -1
+
+    @property
+    def grid(self):
+        """
+        The flat row-major bytearray that holds the values of the cells,
+        it's indexed by the cell ids.
+        """
+        return self._grid
+
+    @property
+    def cells(self):
+        """
+        A list of all the cells as tuples (x, y), in the same order with `cell_ids`.
+        It's built on each access, the algorithms use `cell_ids` instead.
+        """
+        width = self.width
+        return [(i % width, i // width) for i in self.cell_ids]
 
     @property
     def frame_box(self):
-        return self._frame_box
+        """
+        The region (left, top, right, bottom) that has changed since the last
+        frame, or `None` if nothing has changed.
+        """
+        if self._fb_l < 0:
+            return None
+        return (self._fb_l, self._fb_t, self._fb_r, self._fb_b)
 
     @property
     def num_changes(self):
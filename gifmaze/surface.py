@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import shutil
 from io import BytesIO
 from PIL import Image
 from .encoder import (Compression,
@@ -41,13 +42,14 @@ class GIFSurface(object):
         self.size = (width, height)
         self.loop = loop
         self._io = BytesIO()
+        self._compressors = {}  # the LZW encoders used so far, keyed by the minimum code length.
 
         if not isinstance(color_depth, int) and 1 <= color_depth <= 8:
             raise ValueError('Invalid color depth.')
         self.color_depth = color_depth
 
         if not palette:
-            palette = [0] * (3 * 1 << self.color_depth)
+            palette = bytes(3 << self.color_depth)
         self.set_palette(palette)
 
         if not min_code_length:
@@ -66,15 +68,33 @@ class GIFSurface(object):
     __repr__ = __str__
 
     def set_palette(self, palette):
-        """Set the palette of the surface."""
+        """
+        Set the palette of the surface. `palette` is a list of rgb colors
+        or a bytes-like object, see `encoder.global_color_table`.
+        """
         self.palette = global_color_table(self.color_depth, palette)
 
     def set_lzw_compress(self, min_code_length):
         n = max(2, min(12, min_code_length))
-        self._lzw_compress = Compression(n)
+        self._lzw_compress = self._get_compressor(n)
 
-    def write(self, data):
-        self._io.write(data)
+    def _get_compressor(self, min_code_length):
+        """
+        Return an LZW encoder of the given minimum code length. The encoders
+        keep no state between calls, so one instance for each length is reused.
+        """
+        compressor = self._compressors.get(min_code_length)
+        if compressor is None:
+            compressor = self._compressors[min_code_length] = Compression(min_code_length)
+        return compressor
+
+    def write(self, *chunks):
+        """
+        Append encoded data to the in-memory io. Several chunks (e.g. the
+        blocks of one frame) can be passed at once, they are written in order
+        without being concatenated first.
+        """
+        self._io.writelines(chunks)
 
     def compress(self, data):
         return self._lzw_compress(data)
@@ -84,10 +104,14 @@ class GIFSurface(object):
         Draw a rectangle with left-top corner at `(left, top)`
         and size `(width, height)`. `color` is the index of the
         color in the global color table.
+        The pixels of the rectangle are never built, its codes are computed
+        directly by `Compression.encode_constant`.
         """
         descriptor = image_descriptor(left, top, width, height)
-        data = Compression(2)([color] * width * height)
-        self.write(descriptor + data)
+        # the minimum code length must be large enough to hold the color index.
+        compressor = self._get_compressor(max(2, color.bit_length()))
+        data = compressor.encode_constant(color, width * height)
+        self.write(descriptor, data)
 
     @property
     def _gif_header(self):
@@ -105,8 +129,11 @@ class GIFSurface(object):
         """
         with open(filename, 'wb') as f:
             f.write(self._gif_header)
-            f.write(self._io.getvalue())
-            f.write(bytearray([0x3B]))
+            # copy the frames in chunks instead of making a copy of the whole io,
+            # the io is at its end again afterwards so more frames can be written.
+            self._io.seek(0)
+            shutil.copyfileobj(self._io, f, 1 << 20)
+            f.write(b'\x3B')
 
     def clear(self):
         """
@@ -132,40 +159,21 @@ class GIFSurface(object):
         >>> surface.save('test_surface.gif')
         >>> surface.close()
         """
-        # the image file usually contains more than 256 colors
-        # so we need to convert it to gif format first.
-        with BytesIO() as temp_io:
-            Image.open(img_file).convert('RGB').save(temp_io, format='gif')
-            img = Image.open(temp_io).convert('RGB')
-            kwargs['bg_color'] = None
-            surface = cls(img.size[0], img.size[1], *args, **kwargs)
-
-            # iterate over all pixels to get the global color table and indices list.
-            data = list(img.getdata())
-            colors = []
-            indices = []
-            count = 0
-
-            for c in data:
-                if c not in colors:
-                    colors.append(c)
-                    indices.append(count)
-                    count += 1
-                else:
-                    i = colors.index(c)
-                    indices.append(i)
-
-            palette = []
-            for c in colors:
-                palette += c
-
-            # here we do not bother about how many colors are actually in the image,
-            # we simply use full 256 colors.
-            if len(palette) < 3 * 256:
-                palette += [0] * (3 * 256 - len(palette))
-
-            descriptor = image_descriptor(0, 0, img.size[0], img.size[1], 0b10000111)
-            compressed_data = Compression(8)(indices)
-            surface.write(descriptor + bytearray(palette) + compressed_data)
+        # the image file usually contains more than 256 colors so it's reduced to
+        # an adaptive palette of at most 256 colors. Pillow's quantizer gives the
+        # palette and the indices of the pixels at once.
+        img = Image.open(img_file).convert('RGB').convert('P', palette=Image.ADAPTIVE, colors=256)
+        kwargs['bg_color'] = None
+        surface = cls(img.size[0], img.size[1], *args, **kwargs)
+
+        indices = img.tobytes()
+        palette = bytes(img.getpalette()[:3 * 256])
+        # here we do not bother about how many colors are actually in the image,
+        # we simply use full 256 colors.
+        palette += bytes(3 * 256 - len(palette))
+
+        descriptor = image_descriptor(0, 0, img.size[0], img.size[1], 0b10000111)
+        compressed_data = surface._get_compressor(8)(indices)
+        surface.write(descriptor, palette, compressed_data)
 
         return surface